@@ -2,15 +2,25 @@
 Tools to generate Home Assistant configuration files from KNX setup files (ETS) 
 """
 
+import logging
 import re
 import sys
+from bisect import insort
 from enum import Enum
-from functools import reduce
-from typing import Dict, List, Optional, Tuple, TypedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple, TypedDict, cast
 
 import yaml
 
-KNX_ADDRESS_RE = re.compile("^(\\d+)(\\/\\d+)?(\\/\\d+)? (.*)$")
+try:
+    from yaml import CSafeDumper as YAMLDumper
+except ImportError:  # libyaml not available, use the pure Python emitter
+    from yaml import SafeDumper as YAMLDumper  # type: ignore
+
+_LOGGER = logging.getLogger(__name__)
+
+KNX_GROUP_ADDRESS_RE = re.compile("\\d+(?:/\\d+){0,2}")
+KNX_ADDRESS_RE = re.compile("^(%s) (.*)$" % KNX_GROUP_ADDRESS_RE.pattern)
 
 
 class ETSCustomAddressType(Enum):
@@ -39,6 +49,19 @@ ETS_HA_MAP = {
     ETSCustomAddressType.FEEDBACK_DIMVALUE.value: KNXHAProp.BRIGHTNAESS_STATE_ADDRESS.value,
 }
 
+# Longest prefixes first so "feedback dimvalue" is not taken as "feedback"
+ETS_NAME_RE = re.compile(
+    "^(%s)? ?(.*)$"
+    % "|".join(
+        re.escape(t.value)
+        for t in (
+            ETSCustomAddressType.FEEDBACK_DIMVALUE,
+            ETSCustomAddressType.FEEDBACK_ONOFF,
+            ETSCustomAddressType.DIMVALUE,
+        )
+    )
+)
+
 
 class KNXDevice(TypedDict, total=False):
     """Represents a KNX Device"""
@@ -59,137 +82,150 @@ class KNXHeler:
     """Helper functions"""
 
     @staticmethod
-    def check_light(device: KNXLight) -> bool:
-        """Tells whether the given device is valid"""
-        return (
-            KNXHAProp.ADDRESS.value in device
-            and KNXHAProp.STATE_ADDRESS.value in device
-            and not (
-                (KNXHAProp.BRIGHTNESS_ADDRESS.value in device)
-                ^ (KNXHAProp.BRIGHTNAESS_STATE_ADDRESS.value in device)
-            )
-        )
-
-    @staticmethod
-    def should_ignore(device_name: str) -> bool:
-        """Tells whether to process this device or not"""
-        return device_name.startswith(ETSCustomAddressType.DIMMER_PUSH.value)
+    def should_ignore(device_name: str, start: int = 0) -> bool:
+        """Tells whether to process this device or not, looking at the name
+        from position start onwards"""
+        return device_name.startswith(ETSCustomAddressType.DIMMER_PUSH.value, start)
 
     @staticmethod
     def parse_name(s: str) -> Tuple[str, Optional[str]]:
         """Parses name looking for action prefix and name sufix"""
+        return _parse_name(s)
 
-        def _parse(_s, _type):
-            if _s.startswith(_type):
-                _s = _s.replace(_type, "").strip()
-                return _s, ETS_HA_MAP.get(_type)
-            return None
 
-        tup = _parse(s, ETSCustomAddressType.FEEDBACK_DIMVALUE.value)
-        if tup is None:
-            tup = _parse(s, ETSCustomAddressType.FEEDBACK_ONOFF.value)
-        if tup is None:
-            tup = _parse(s, ETSCustomAddressType.DIMVALUE.value)
-        if tup is None:
-            tup = (s, ETS_HA_MAP.get(ETSCustomAddressType.ONOFF.value))
-
-        return tup[0].lower().strip().replace(" ", "_"), tup[1]
+@lru_cache(maxsize=4096)
+def _parse_name(s: str) -> Tuple[str, Optional[str]]:
+    """Cached implementation of KNXHeler.parse_name"""
+    # ETS_NAME_RE matches any single line string
+    m = cast("re.Match[str]", ETS_NAME_RE.match(s))
+    _type = m.group(1) or ETSCustomAddressType.ONOFF.value
+    return m.group(2).lower().strip().replace(" ", "_"), ETS_HA_MAP.get(_type)
 
 
 class KNXProject:
     """Encapsulates KNX Project"""
 
     def __init__(self) -> None:
-        self.devices: Dict[str, KNXLight] = {}
+        # Device properties are stored by property rather than by device: one
+        # map per KNXHAProp from device name to group address.
+        # device_names is kept sorted as names are inserted; _known_names
+        # holds the same names for constant time membership tests.
+        self.device_names: List[str] = []
+        self._known_names: Set[str] = set()
+        self.prop_maps: Dict[str, Dict[str, str]] = {
+            prop.value: {} for prop in KNXHAProp
+        }
+
+    def get_device(self, name: str) -> KNXLight:
+        """Builds the device with the given name from the property maps"""
+        device: KNXLight = {"name": name}
+        for prop, addresses in self.prop_maps.items():
+            if name in addresses:
+                device[prop] = addresses[name]  # type: ignore
+        return device
+
+    def get_devices(self) -> Dict[str, KNXLight]:
+        """Builds all devices of this project, keyed by name. The result is a
+        copy: changing it does not change the project"""
+        return {n: self.get_device(n) for n in self.device_names}
+
+    def check_device(self, name: str) -> bool:
+        """Tells whether the device with the given name is valid"""
+        m = self.prop_maps
+        return (
+            name in m[KNXHAProp.ADDRESS.value]
+            and name in m[KNXHAProp.STATE_ADDRESS.value]
+            and not (
+                (name in m[KNXHAProp.BRIGHTNESS_ADDRESS.value])
+                ^ (name in m[KNXHAProp.BRIGHTNAESS_STATE_ADDRESS.value])
+            )
+        )
 
     def check(self) -> bool:
         """Tells whether this project includes valid devices"""
-        return reduce(
-            lambda c, cc: c and cc,
-            [KNXHeler.check_light(d) for d in self.devices.values()],
-        )  # type: ignore
+        return all(self.check_device(n) for n in self.device_names)
 
     def remove_invalid_devices(self) -> List[KNXLight]:
         """Removes the invalid devices and return the removed items"""
-        invalid: List[KNXLight] = []
-        for d in self.devices.values():
-            if not KNXHeler.check_light(d):
-                invalid.append(d)
-        for inv in invalid:
-            del self.devices[inv["name"]]  # type: ignore
+        valid: List[str] = [n for n in self.device_names if self.check_device(n)]
+        kept = set(valid)
+        invalid: List[KNXLight] = [
+            self.get_device(n) for n in self.device_names if n not in kept
+        ]
+        self.device_names = valid
+        self._known_names = kept
+        self.prop_maps = {
+            prop: {n: a for n, a in addresses.items() if n in kept}
+            for prop, addresses in self.prop_maps.items()
+        }
         return invalid
 
     def _parse_line(self, l: str):
 
+        # Addresses never contain spaces, so the name starts after the first one.
+        # Only skip lines that start with a valid address, so that malformed
+        # lines still reach the regex below and get reported.
+        idx = l.find(" ")
+        if (
+            idx > 0
+            and KNXHeler.should_ignore(l, idx + 1)
+            and KNX_GROUP_ADDRESS_RE.fullmatch(l, 0, idx) is not None
+        ):
+            _LOGGER.debug("Ignoring KNX address: '%s'", l)
+            return
+
         s = KNX_ADDRESS_RE.match(l)
         if s is not None:
-            address_main = s.group(1)
-            address_middle = (
-                s.group(2).replace("/", "") if s.group(2) is not None else None
-            )
-            address_subgroup = (
-                s.group(3).replace("/", "") if s.group(3) is not None else None
-            )
-            name = s.group(4)
+            full_address: str = s.group(1)
+            name = s.group(2)
         else:
-            print(f"Malformed KNX address: '{l}'")
+            _LOGGER.warning("Malformed KNX address: '%s'", l)
             return
 
-        if KNXHeler.should_ignore(name):
-            print(f"Ignoring KNX address: '{l}'")
+        depth = full_address.count("/")
+        if depth == 0:
+            _LOGGER.debug("Processing main group %s: %s", full_address, name)
             return
-
-        if address_middle is None:
-            print(f"Processing main group {address_main}: {name}")
-            return
-        if address_subgroup is None:
-            print(
-                f"Processing middle group {address_main} / {address_middle} : {name}"
-            )
+        if depth == 1:
+            _LOGGER.debug("Processing middle group %s : %s", full_address, name)
             return
 
         device_name, device_prop = KNXHeler.parse_name(name)
         if device_prop is None:
-            print(f"Unable to extract device property from name '{name}'")
+            _LOGGER.warning("Unable to extract device property from name '%s'", name)
             return
-        assert device_prop is not None
 
-        full_address: str = (
-            f"{address_main}/{address_middle}/{address_subgroup}"
-        )
-        if device_name not in self.devices:
-            self.devices[device_name] = {"name": device_name}
-        device: KNXLight = self.devices[device_name]
-        device[device_prop] = full_address
+        if device_name not in self._known_names:
+            self._known_names.add(device_name)
+            insort(self.device_names, device_name)
+        self.prop_maps[device_prop][device_name] = full_address
 
     @classmethod
     def load_from_ets(cls, file: str) -> "KNXProject":
         """Factory method to create a project from an ETS file"""
         _proj: KNXProject = KNXProject()
 
-        with open(file, mode="r+", encoding="UTF-8") as f:
-            lines = f.readlines()
-
-        for l in lines:
-            l = l.strip()
-            if l != "":
-                _proj._parse_line(l)
+        with open(file, mode="r", encoding="UTF-8", buffering=1 << 16) as f:
+            for l in f:
+                l = l.strip()
+                if l != "":
+                    _proj._parse_line(l)
 
         invalid: List[KNXLight] = _proj.remove_invalid_devices()
-        print("Removed devices due to invalid config:")
+        if invalid:
+            _LOGGER.warning("Removed devices due to invalid config:")
         for inv in invalid:
-            print(inv)
+            _LOGGER.warning("%s", inv)
 
         return _proj
 
     def to_yaml(self, devices_type: str, root: Optional[str] = None) -> str:
         """Creates a yaml representation of this project"""
 
-        device_names: List[str] = sorted(list(self.devices.keys()))
-        d: dict = {devices_type: [self.devices[n] for n in device_names]}
+        d: dict = {devices_type: [self.get_device(n) for n in self.device_names]}
         if root is not None:
             d = {root: d}
-        return yaml.dump(d, indent=2)
+        return yaml.dump(d, Dumper=YAMLDumper, indent=2, sort_keys=False)
 
 
 if __name__ == "__main__":
@@ -197,6 +233,8 @@ if __name__ == "__main__":
         print("Takes only one argument: ETS input file")
         sys.exit(1)
 
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     filename = sys.argv[1]
     p: KNXProject = KNXProject.load_from_ets(file=filename)
 
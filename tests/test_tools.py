@@ -0,0 +1,143 @@
+import logging
+import os
+
+import pytest
+
+from tools import KNXHeler, KNXProject
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("Living lamp", ("living_lamp", "address")),
+        ("feedback Living lamp", ("living_lamp", "state_address")),
+        ("dimvalue Living lamp", ("living_lamp", "brightness_address")),
+        ("feedback dimvalue Living lamp", ("living_lamp", "brightness_state_address")),
+        ("feedback feedback light", ("feedback_light", "state_address")),
+        ("feedback  Two  Spaces ", ("two__spaces", "state_address")),
+        ("feedback", ("", "state_address")),
+        ("Feedback lamp", ("feedback_lamp", "address")),
+    ],
+)
+def test_parse_name(name, expected):
+    assert KNXHeler.parse_name(name) == expected
+
+
+@pytest.mark.parametrize(
+    "name, start, expected",
+    [
+        ("dimmer lamp", 0, True),
+        ("1/1/5 dimmer lamp", 6, True),
+        ("1/1/5 lamp dimmer", 6, False),
+        ("lamp", 0, False),
+    ],
+)
+def test_should_ignore(name, start, expected):
+    assert KNXHeler.should_ignore(name, start) is expected
+
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "ets.txt")
+
+EXPECTED_YAML = """\
+light:
+- name: kitchen
+  address: 1/2/1
+  state_address: 1/2/2
+- name: living_lamp
+  address: 1/1/1
+  state_address: 1/1/2
+  brightness_address: 1/1/3
+  brightness_state_address: 1/1/4
+"""
+
+
+@pytest.fixture
+def project():
+    return KNXProject.load_from_ets(FIXTURE)
+
+
+def test_load_from_ets_to_yaml(project):
+    assert project.to_yaml(devices_type="light") == EXPECTED_YAML
+
+
+def test_to_yaml_root(project):
+    assert project.to_yaml(devices_type="light", root="knx").startswith(
+        "knx:\n  light:\n  - name: kitchen\n"
+    )
+
+
+def test_load_from_ets_removes_invalid_devices(caplog):
+    with caplog.at_level(logging.WARNING):
+        KNXProject.load_from_ets(FIXTURE)
+    assert caplog.messages == [
+        "Malformed KNX address: 'garbage line'",
+        "Removed devices due to invalid config:",
+        str(
+            {
+                "name": "broken",
+                "address": "1/2/5",
+                "state_address": "1/2/6",
+                "brightness_address": "1/2/4",
+            }
+        ),
+        str({"name": "hall", "address": "1/2/3"}),
+    ]
+
+
+def test_remove_invalid_devices():
+    proj = KNXProject()
+    for l in ["1/1/1 lamp", "1/1/2 feedback lamp", "1/1/3 dimvalue lamp", "1/1/4 hall"]:
+        proj._parse_line(l)
+    assert not proj.check()
+    assert proj.remove_invalid_devices() == [
+        {"name": "hall", "address": "1/1/4"},
+        {
+            "name": "lamp",
+            "address": "1/1/1",
+            "state_address": "1/1/2",
+            "brightness_address": "1/1/3",
+        },
+    ]
+    assert proj.device_names == []
+    assert proj.check()
+
+
+def test_check_empty_project():
+    assert KNXProject().check()
+
+
+def test_get_devices_is_a_copy(project):
+    devices = project.get_devices()
+    assert list(devices) == ["kitchen", "living_lamp"]
+    devices["kitchen"]["address"] = "9/9/9"
+    del devices["living_lamp"]
+    assert project.get_devices()["kitchen"]["address"] == "1/2/1"
+    assert project.device_names == ["kitchen", "living_lamp"]
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "x dimmer y",
+        "dimmer",
+        "/1 dimmer z",
+        "1//2 dimmer w",
+        "1/2/3/4 dimmer q",
+        "²/1/1 dimmer x",
+    ],
+)
+def test_malformed_dimmer_line_is_reported(line, caplog):
+    proj = KNXProject()
+    with caplog.at_level(logging.WARNING):
+        proj._parse_line(line)
+    assert caplog.messages == [f"Malformed KNX address: '{line}'"]
+    assert proj.device_names == []
+
+
+@pytest.mark.parametrize("line", ["1 dimmer x", "1/1 dimmer x", "1/1/5 dimmer x"])
+def test_dimmer_line_is_ignored(line, caplog):
+    proj = KNXProject()
+    with caplog.at_level(logging.DEBUG):
+        proj._parse_line(line)
+    assert caplog.messages == [f"Ignoring KNX address: '{line}'"]
+    assert proj.device_names == []